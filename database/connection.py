@@ -2,27 +2,78 @@ from typing import Annotated
 from sqlmodel import Session, SQLModel, create_engine, text
 from fastapi import Depends
 from urllib.parse import quote_plus
+from threading import Lock
 
 import os
+import time
 
-username = os.getenv("DB_USERNAME")
-password = quote_plus(os.getenv("DB_PASSWORD"))
-server = os.getenv("DB_SERVER")
-database = os.getenv("DB_DATABASE")
 
-connection_string = (
-    f"mssql+pyodbc://{username}:{password}@{server}:1433/{database}"
-    "?driver=ODBC+Driver+18+for+SQL+Server"
-    "&encrypt=yes"
-    "&trustservercertificate=no"
-    "&connection+timeout=30"
-)
+def build_connection_string():
+    username = os.getenv("DB_USERNAME")
+    password = quote_plus(os.getenv("DB_PASSWORD"))
+    server = os.getenv("DB_SERVER")
+    database = os.getenv("DB_DATABASE")
 
-engine = create_engine(connection_string, echo=True)
+    return (
+        f"mssql+pyodbc://{username}:{password}@{server}:1433/{database}"
+        "?driver=ODBC+Driver+18+for+SQL+Server"
+        "&encrypt=yes"
+        "&trustservercertificate=no"
+        "&connection+timeout=30"
+    )
+
+
+def make_engine(url: str):
+    # Helyi teszteléshez SQLite fájl is megadható (DATABASE_URL=sqlite:///primary.db)
+    if url.startswith("sqlite"):
+        return create_engine(
+            url, echo=True, connect_args={"check_same_thread": False}
+        )
+    return create_engine(url, echo=True)
+
+
+connection_string = os.getenv("DATABASE_URL") or build_connection_string()
+read_connection_string = os.getenv("DATABASE_READ_URL")
+
+engine = make_engine(connection_string)
+
+# Opcionális read replica: ha nincs megadva, minden olvasás is a primary-ra megy
+read_engine = make_engine(read_connection_string) if read_connection_string else engine
+
+# Írás után ennyi ideig a felhasználó olvasásai is a primary-ról mennek (read-your-writes).
+# A folyamaton belüli dict csak gyorsítás; workerek között a read_pin cookie viszi át (oauth2.py).
+read_your_writes_seconds = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+_recent_writes: dict[int, float] = {}
+_recent_writes_lock = Lock()
 
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    if read_engine is not engine:
+        SQLModel.metadata.create_all(read_engine)
+
+
+def mark_recent_write(user_id: int):
+    now = time.monotonic()
+    with _recent_writes_lock:
+        _recent_writes[user_id] = now + read_your_writes_seconds
+
+        # lejárt bejegyzések takarítása, hogy a dict ne nőjön korlátlanul
+        if len(_recent_writes) > 1000:
+            for key in [k for k, v in _recent_writes.items() if v <= now]:
+                del _recent_writes[key]
+
+
+def has_recent_write(user_id: int) -> bool:
+    with _recent_writes_lock:
+        pinned_until = _recent_writes.get(user_id)
+        if pinned_until is None:
+            return False
+        if pinned_until <= time.monotonic():
+            del _recent_writes[user_id]
+            return False
+        return True
 
 
 def get_session():
@@ -30,4 +81,18 @@ def get_session():
         yield session
 
 
+def get_read_session_for(user_id: int | None, pinned: bool = False):
+    if (
+        read_engine is engine
+        or pinned
+        or (user_id is not None and has_recent_write(user_id))
+    ):
+        target = engine
+    else:
+        target = read_engine
+
+    with Session(target) as session:
+        yield session
+
+
 SessionDep = Annotated[Session, Depends(get_session)]
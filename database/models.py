@@ -45,6 +45,26 @@ class UserRead(SQLModel):
 class Token(SQLModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+
+class RefreshRequest(SQLModel):
+    refresh_token: Optional[str] = None
+
+
+class RefreshToken(SQLModel, table=True):
+    __tablename__ = "refresh_tokens"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    token_hash: str = Field(index=True, unique=True, max_length=64)
+    user_id: int = Field(foreign_key="users.id", index=True)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    expires_at: datetime
+    revoked_at: Optional[datetime] = None
+    # egy bejelentkezésből származó tokenek lánca
+    family_id: Optional[str] = Field(default=None, index=True, max_length=32)
+    # kitöltve, ha a tokent frissítés cserélte le (kijelentkezéskor üres marad)
+    replaced_by_id: Optional[int] = None
 
 
 class TokenWithUser(Token):
@@ -76,14 +96,22 @@ class Todo(SQLModel, table=True):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     modified_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     completed_at: Optional[datetime] = None
-    deadline: datetime
+    deadline: datetime = Field(index=True)
     priority: Optional[int] = Field(default=1, ge=1, le=5)
     archived: bool = Field(default=False)
 
-    user_id: int = Field(foreign_key="users.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
     user: Optional[User] = Relationship(back_populates="todos")
 
 
+class UserShard(SQLModel, table=True):
+    __tablename__ = "user_shards"
+
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    shard: str = Field(max_length=50, index=True)
+    moving: bool = Field(default=False)
+
+
 class TodoRead(SQLModel):
     id: int
     title: str
@@ -118,3 +146,11 @@ class TodoUpdate(SQLModel):
     deadline: Optional[datetime] = None
     priority: Optional[int] = None
     archived: Optional[bool] = None
+
+
+class SchedulerLease(SQLModel, table=True):
+    __tablename__ = "scheduler_leases"
+
+    name: str = Field(primary_key=True, max_length=50)
+    owner: str = Field(max_length=100)
+    expires_at: datetime
@@ -0,0 +1,227 @@
+"""
+Felhasználók áthelyezése shardok között.
+
+    python -m database.rebalance --dry-run
+    python -m database.rebalance
+    python -m database.rebalance --from-primary
+    python -m database.rebalance --user-id 42 --to shard1
+
+Paraméter nélkül minden felhasználót a hash ring szerinti shardjára költöztet
+(pl. új shard felvétele után). A --from-primary a shardolás bekapcsolása előtt
+a primary todo táblájába írt todókat is átköltözteti; amíg ez nem fut le, ezek
+a felhasználók a "primary" shardról kapják az adataikat.
+
+A felhasználókat --batch-size méretű csoportokban költözteti, csoportonként
+egyszeri --grace várakozással. Áthelyezés közben a felhasználó írásai 503-at
+kapnak. A todók új azonosítót kapnak a cél shardon. Egy félbeszakadt
+áthelyezés ugyanazzal a paranccsal biztonságosan újrafuttatható.
+"""
+
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+from sqlmodel import Session, delete, select, update
+from database.connection import engine
+from database.models import Todo, UserShard
+from database.sharding import (
+    PRIMARY_SHARD,
+    sharded,
+    routing_engines,
+    ring,
+    shard_cache_seconds,
+    lookup_assignment,
+    invalidate_assignment,
+    create_shard_tables,
+)
+from collections import Counter, defaultdict
+import argparse
+import time
+
+# A többi worker cache-e és a folyamatban lévő kérések kifutása
+MOVE_GRACE_SECONDS = shard_cache_seconds + 2
+
+# Ennyi felhasználót kerítünk el és költöztetünk egyszerre (egy várakozással)
+MOVE_BATCH_SIZE = 500
+
+
+def set_assignments(user_ids, shard: str | None = None, moving: bool = False):
+    values = {"moving": moving}
+    if shard is not None:
+        values["shard"] = shard
+
+    with Session(engine) as directory:
+        directory.exec(
+            update(UserShard).where(UserShard.user_id.in_(user_ids)).values(**values)
+        )
+        directory.commit()
+    for user_id in user_ids:
+        invalidate_assignment(user_id)
+
+
+def purge_copies(user_id: int, keep: str):
+    # Egy korábbi, félbeszakadt áthelyezés maradékai a nem aktív shardokon
+    removed = 0
+    for name, shard_engine in routing_engines.items():
+        if name == keep:
+            continue
+        with Session(shard_engine) as session:
+            result = session.exec(delete(Todo).where(Todo.user_id == user_id))
+            session.commit()
+            removed += result.rowcount
+    return removed
+
+
+def group_user_ids(moves, key):
+    # (user_id, forrás, cél) hármasok csoportosítása key(forrás, cél) szerint
+    groups = defaultdict(list)
+    for user_id, source, target in moves:
+        groups[key(source, target)].append(user_id)
+    return groups
+
+
+def copy_todos(source: str, target: str, user_ids: list[int]):
+    # a cél shardon lévő régi maradékokat ugyanabban a tranzakcióban töröljük
+    with Session(routing_engines[source]) as src, Session(
+        routing_engines[target]
+    ) as dst:
+        todos = src.exec(select(Todo).where(Todo.user_id.in_(user_ids))).all()
+
+        dst.exec(delete(Todo).where(Todo.user_id.in_(user_ids)))
+        dst.add_all(Todo(**todo.model_dump(exclude={"id"})) for todo in todos)
+        dst.commit()
+
+    return Counter(todo.user_id for todo in todos)
+
+
+def move_batch(moves, grace_seconds: float):
+    """
+    moves: (user_id, cél shard) párok. A kerítést és a várakozást az egész
+    batch-re egyszer végezzük. Visszatér: felhasználónként az átmásolt todók száma.
+    """
+    counts = {}
+    pending = []
+    unfence = []
+    for user_id, target in moves:
+        invalidate_assignment(user_id)
+        source, moving = lookup_assignment(user_id)
+        counts[user_id] = 0
+
+        if source == target:
+            purge_copies(user_id, keep=target)
+            if moving:
+                unfence.append(user_id)
+        else:
+            pending.append((user_id, source, target))
+
+    if unfence:
+        set_assignments(unfence, moving=False)
+    if not pending:
+        return counts
+    user_ids = [user_id for user_id, _, _ in pending]
+
+    # 1. kerítés: innentől az írások 503-at kapnak, az olvasások a forrásról mennek
+    set_assignments(user_ids, moving=True)
+    time.sleep(grace_seconds)
+
+    # 2. másolás forrás-cél páronként
+    for (source, target), group in group_user_ids(
+        pending, lambda source, target: (source, target)
+    ).items():
+        copied = copy_todos(source, target, group)
+        for user_id in group:
+            counts[user_id] = copied[user_id]
+
+    # 3. directory átállítása; a kerítés a régi sorok törléséig marad, így egy
+    # félbeszakadt futás után a felhasználók újra bekerülnek a tervbe
+    for target, group in group_user_ids(pending, lambda source, target: target).items():
+        set_assignments(group, shard=target, moving=True)
+    time.sleep(grace_seconds)
+
+    # 4. régi sorok törlése és a kerítés feloldása
+    for source, group in group_user_ids(pending, lambda source, target: source).items():
+        with Session(routing_engines[source]) as src:
+            src.exec(delete(Todo).where(Todo.user_id.in_(group)))
+            src.commit()
+    set_assignments(user_ids, moving=False)
+
+    return counts
+
+
+def move_user(user_id: int, target: str, grace_seconds: float = MOVE_GRACE_SECONDS):
+    # egyetlen felhasználó (--user-id) áthelyezése
+    return move_batch([(user_id, target)], grace_seconds)[user_id]
+
+
+def plan_moves(from_primary: bool = False):
+    if from_primary:
+        # a shardolás előtti todók tulajdonosai; a lookup directory bejegyzést is ad nekik
+        with Session(engine) as session:
+            user_ids = session.exec(select(Todo.user_id).distinct()).all()
+        for user_id in user_ids:
+            lookup_assignment(user_id)
+
+    with Session(engine) as session:
+        assignments = session.exec(select(UserShard)).all()
+
+    return [
+        (assignment.user_id, assignment.shard, ring.get(assignment.user_id))
+        for assignment in assignments
+        if assignment.shard != ring.get(assignment.user_id) or assignment.moving
+        if from_primary or assignment.shard != PRIMARY_SHARD
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebalance users between shards")
+    parser.add_argument("--user-id", type=int)
+    parser.add_argument("--to", dest="target")
+    parser.add_argument(
+        "--from-primary",
+        action="store_true",
+        help="also move todos written to the primary before sharding was enabled",
+    )
+    parser.add_argument("--grace", type=float, default=MOVE_GRACE_SECONDS)
+    parser.add_argument("--batch-size", type=int, default=MOVE_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    if not sharded:
+        parser.error("DATABASE_SHARD_URLS is not configured")
+    if (args.user_id is None) != (args.target is None):
+        parser.error("--user-id and --to must be used together")
+    if args.target is not None and args.target not in routing_engines:
+        parser.error(f"unknown shard '{args.target}'")
+
+    create_shard_tables()
+
+    if args.user_id is not None:
+        source = lookup_assignment(args.user_id)[0]
+        if args.dry_run:
+            print(f"user {args.user_id}: {source} -> {args.target}")
+            return
+        count = move_user(args.user_id, args.target, grace_seconds=args.grace)
+        print(f"user {args.user_id}: {source} -> {args.target} ({count} todos)")
+        return
+
+    moves = plan_moves(from_primary=args.from_primary)
+    if not moves:
+        print("Nothing to move.")
+        return
+
+    if args.dry_run:
+        for user_id, source, target in moves:
+            print(f"user {user_id}: {source} -> {target}")
+        return
+
+    for start in range(0, len(moves), args.batch_size):
+        batch = moves[start : start + args.batch_size]
+        counts = move_batch(
+            [(user_id, target) for user_id, _, target in batch], args.grace
+        )
+        for user_id, source, target in batch:
+            print(f"user {user_id}: {source} -> {target} ({counts[user_id]} todos)")
+
+
+if __name__ == "__main__":
+    main()
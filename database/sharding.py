@@ -0,0 +1,207 @@
+from bisect import bisect
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from sqlalchemy import Column, MetaData, Table
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from database.connection import engine, read_engine, make_engine, get_read_session_for
+from database.models import Todo, UserShard
+import hashlib
+import os
+import time
+
+# Pl. DATABASE_SHARD_URLS="shard0=sqlite:///shard0.db,shard1=sqlite:///shard1.db"
+# Ha nincs megadva, a todók a primary adatbázisban maradnak (egyetlen "default" shard).
+shard_urls = os.getenv("DATABASE_SHARD_URLS")
+
+# A directory bejegyzések ennyi ideig cache-elhetők folyamaton belül
+shard_cache_seconds = float(os.getenv("SHARD_DIRECTORY_CACHE_SECONDS", "5"))
+
+VIRTUAL_NODES = 64
+
+# A shardolás előtti todók a primary todo táblájában vannak; az ilyen
+# felhasználók a "primary" shardra mutatnak, amíg a rebalance át nem költözteti őket
+PRIMARY_SHARD = "primary"
+
+
+class ShardMovingError(Exception):
+    pass
+
+
+def parse_shard_urls(value: str):
+    shards = {}
+    for i, item in enumerate(part.strip() for part in value.split(",")):
+        if not item:
+            continue
+        name, sep, url = item.partition("=")
+        if not sep or "://" in name:
+            name, url = f"shard{i}", item
+        shards[name.strip()] = url.strip()
+
+    if PRIMARY_SHARD in shards:
+        raise ValueError(f"'{PRIMARY_SHARD}' is reserved and cannot be a shard name")
+    return shards
+
+
+sharded = bool(shard_urls)
+
+if sharded:
+    shard_engines = {
+        name: make_engine(url) for name, url in parse_shard_urls(shard_urls).items()
+    }
+    routing_engines = {**shard_engines, PRIMARY_SHARD: engine}
+else:
+    shard_engines = {"default": engine}
+    routing_engines = shard_engines
+
+# Fan-out olvasásokhoz: shardolás nélkül a read replica (ha van)
+read_engines = list(routing_engines.values()) if sharded else [read_engine]
+
+
+class HashRing:
+    def __init__(self, names, virtual_nodes: int = VIRTUAL_NODES):
+        points = sorted(
+            (self.hash(f"{name}#{i}"), name)
+            for name in names
+            for i in range(virtual_nodes)
+        )
+        self._keys = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    @staticmethod
+    def hash(value: str):
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+    def get(self, user_id: int):
+        index = bisect(self._keys, self.hash(str(user_id))) % len(self._keys)
+        return self._names[index]
+
+
+ring = HashRing(shard_engines)
+
+
+def shard_table(metadata: MetaData):
+    # A shardokon nincs users tábla, ezért a todo táblát idegen kulcs nélkül hozzuk létre
+    columns = [
+        Column(
+            column.name,
+            column.type,
+            primary_key=column.primary_key,
+            nullable=column.nullable,
+            index=column.index,
+        )
+        for column in Todo.__table__.columns
+    ]
+    return Table(Todo.__table__.name, metadata, *columns)
+
+
+def create_shard_tables():
+    if not sharded:
+        return
+    metadata = MetaData()
+    shard_table(metadata)
+    for shard_engine in shard_engines.values():
+        metadata.create_all(shard_engine)
+
+
+_assignments: dict[int, tuple[float, str, bool]] = {}
+_assignments_lock = Lock()
+
+
+def invalidate_assignment(user_id: int | None = None):
+    with _assignments_lock:
+        if user_id is None:
+            _assignments.clear()
+        else:
+            _assignments.pop(user_id, None)
+
+
+def has_primary_todos(session: Session, user_id: int):
+    statement = select(Todo.id).where(Todo.user_id == user_id).limit(1)
+    return session.exec(statement).first() is not None
+
+
+def lookup_assignment(user_id: int):
+    """
+    (shard, moving) a felhasználóhoz. A shard directory (user_shards tábla a
+    primary-n) az irányadó; ha még nincs bejegyzés, a primary-n maradt régi
+    todók miatt a "primary" shardot, egyébként a hash ring szerintit kapja.
+    """
+    if not sharded:
+        return "default", False
+
+    now = time.monotonic()
+    with _assignments_lock:
+        cached = _assignments.get(user_id)
+        if cached and cached[0] > now:
+            return cached[1], cached[2]
+
+    with Session(engine) as session:
+        assignment = session.get(UserShard, user_id)
+
+        if assignment is None:
+            if has_primary_todos(session, user_id):
+                shard = PRIMARY_SHARD
+            else:
+                shard = ring.get(user_id)
+            assignment = UserShard(user_id=user_id, shard=shard)
+            session.add(assignment)
+            try:
+                session.commit()
+            except IntegrityError:
+                # egy párhuzamos kérés közben már beírta
+                session.rollback()
+                assignment = session.get(UserShard, user_id)
+
+        shard, moving = assignment.shard, assignment.moving
+
+    if shard not in routing_engines:
+        raise RuntimeError(f"User {user_id} is assigned to unknown shard '{shard}'")
+
+    with _assignments_lock:
+        _assignments[user_id] = (now + shard_cache_seconds, shard, moving)
+    return shard, moving
+
+
+def shard_for_user(user_id: int):
+    return lookup_assignment(user_id)[0]
+
+
+def engine_for_user(user_id: int, write: bool = False):
+    shard, moving = lookup_assignment(user_id)
+    # Áthelyezés közben csak olvasni lehet (a forrás shardról)
+    if write and moving:
+        raise ShardMovingError(f"User {user_id} is being moved to another shard")
+    return routing_engines[shard]
+
+
+def has_read_replica():
+    # Read replica csak shardolás nélküli módban van
+    return not sharded and read_engine is not engine
+
+
+def get_shard_read_session_for(user_id: int, pinned: bool = False):
+    if not sharded:
+        yield from get_read_session_for(user_id, pinned)
+        return
+
+    with Session(engine_for_user(user_id)) as session:
+        yield session
+
+
+def fan_out(fn, engines=None):
+    """
+    fn(session) futtatása minden shardon párhuzamosan; az eredmények listája
+    shardonként. Alapból a read engine-eken fut.
+    """
+    engines = list(engines) if engines is not None else read_engines
+
+    def run(shard_engine):
+        with Session(shard_engine) as session:
+            return fn(session)
+
+    if len(engines) == 1:
+        return [run(engines[0])]
+
+    with ThreadPoolExecutor(max_workers=len(engines)) as executor:
+        return list(executor.map(run, engines))
@@ -4,17 +4,23 @@ load_dotenv(override=True)
 
 from fastapi import FastAPI
 from database.connection import create_db_and_tables
+from database.sharding import create_shard_tables
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from routers.auth import authentication
 from routers.user import users
 from routers.todo import todos
+from routers.admin import analytics
+from utils.deadline_scheduler import deadline_scheduler
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_db_and_tables()
+    create_shard_tables()
+    deadline_scheduler.start()
     yield
+    await deadline_scheduler.stop()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -38,3 +44,4 @@ app.add_middleware(
 app.include_router(authentication.router, prefix="/api/v1")
 app.include_router(todos.router, prefix="/api/v1")
 app.include_router(users.router, prefix="/api/v1")
+app.include_router(analytics.router, prefix="/api/v1")
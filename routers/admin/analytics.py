@@ -0,0 +1,172 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import and_, case
+from sqlmodel import select, func
+from database.models import Todo, Category, UserRead
+from routers.auth.oauth2 import get_current_user
+from database.sharding import fan_out
+from datetime import datetime, timezone, timedelta
+from threading import Lock
+from typing import Annotated
+import os
+import time
+import pandas as pd
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+analytics_cache_seconds = float(os.getenv("ANALYTICS_CACHE_SECONDS", "60"))
+ANALYTICS_BATCH_SIZE = 10_000
+
+CATEGORY_LABELS = {c: c.value for c in Category}
+
+_cache: dict[int, tuple[float, dict]] = {}
+_cache_lock = Lock()
+
+
+def get_admin_user(current_user: Annotated[UserRead, Depends(get_current_user)]):
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required.",
+        )
+    return current_user
+
+
+def shard_summary(session, now: datetime):
+    # Shardonként egyetlen aggregált lekérdezés az összes felhasználóra
+    completed = func.sum(case((Todo.status == "done", 1), else_=0))
+    # Az archivált todók inaktívak (a határidő-ütemező sem figyeli őket)
+    overdue = func.sum(
+        case(
+            (
+                and_(
+                    Todo.status != "done",
+                    Todo.archived == False,
+                    Todo.deadline < now,
+                ),
+                1,
+            ),
+            else_=0,
+        )
+    )
+    statement = select(
+        Todo.category, Todo.priority, func.count(), completed, overdue
+    ).group_by(Todo.category, Todo.priority)
+
+    return session.exec(statement).all()
+
+
+def summary_by_category_and_priority(shard_rows):
+    merged: dict[tuple, list[int]] = {}
+    for rows in shard_rows:
+        for category, priority, total, completed_count, overdue_count in rows:
+            key = (CATEGORY_LABELS.get(category, category), priority)
+            counts = merged.setdefault(key, [0, 0, 0])
+            counts[0] += total
+            counts[1] += completed_count or 0
+            counts[2] += overdue_count or 0
+
+    summary = []
+    for (category, priority), (total, completed_count, overdue_count) in sorted(
+        merged.items(), key=lambda item: (item[0][0], item[0][1] or 0)
+    ):
+        summary.append(
+            {
+                "category": category,
+                "priority": priority,
+                "total": total,
+                "completed": completed_count,
+                "overdue": overdue_count,
+                "completion_rate": round(completed_count / total, 4) if total else 0.0,
+            }
+        )
+    return summary
+
+
+def shard_completed_frames(session, since: datetime):
+    statement = (
+        select(Todo.category, Todo.priority, Todo.completed_at)
+        .where(Todo.status == "done", Todo.completed_at >= since)
+        .execution_options(yield_per=ANALYTICS_BATCH_SIZE)
+    )
+
+    return [
+        pd.DataFrame.from_records(
+            rows, columns=["category", "priority", "completed_at"]
+        )
+        for rows in session.exec(statement).partitions()
+    ]
+
+
+def weekly_throughput(shard_frames):
+    frames = [frame for frames in shard_frames for frame in frames]
+    if not frames:
+        return []
+
+    df = pd.concat(frames, ignore_index=True)
+    df["category"] = df["category"].map(CATEGORY_LABELS)
+    df["priority"] = df["priority"].astype("Int64")
+    df["week"] = (
+        pd.to_datetime(df["completed_at"], utc=True)
+        .dt.tz_localize(None)
+        .dt.to_period("W-SUN")
+        .dt.start_time.dt.date
+    )
+
+    counts = (
+        df.groupby(["week", "category", "priority"], dropna=False)
+        .size()
+        .reset_index(name="completed")
+        .sort_values(["week", "category", "priority"])
+    )
+    counts["priority"] = counts["priority"].astype(object).where(
+        counts["priority"].notna(), None
+    )
+    return counts.to_dict(orient="records")
+
+
+def compute_analytics(weeks: int):
+    now = datetime.now(timezone.utc)
+    since = now - timedelta(weeks=weeks)
+
+    # Minden shardon párhuzamosan fut, az eredményeket itt fésüljük össze
+    shard_results = fan_out(
+        lambda session: (
+            shard_summary(session, now),
+            shard_completed_frames(session, since),
+        )
+    )
+    summary = summary_by_category_and_priority(rows for rows, _ in shard_results)
+
+    total = sum(row["total"] for row in summary)
+    completed = sum(row["completed"] for row in summary)
+    overdue = sum(row["overdue"] for row in summary)
+
+    return {
+        "generated_at": now,
+        "totals": {
+            "total": total,
+            "completed": completed,
+            "overdue": overdue,
+            "completion_rate": round(completed / total, 4) if total else 0.0,
+        },
+        "by_category_priority": summary,
+        "weekly_throughput": weekly_throughput(frames for _, frames in shard_results),
+    }
+
+
+@router.get("/analytics")
+def get_analytics(
+    admin: Annotated[UserRead, Depends(get_admin_user)],
+    weeks: int = Query(12, ge=1, le=104),
+):
+    with _cache_lock:
+        cached = _cache.get(weeks)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+    result = compute_analytics(weeks)
+
+    with _cache_lock:
+        _cache[weeks] = (time.monotonic() + analytics_cache_seconds, result)
+
+    return result
@@ -1,13 +1,25 @@
-from fastapi import APIRouter, status, HTTPException, Depends
+from fastapi import APIRouter, status, HTTPException, Depends, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.exc import OperationalError
-from database.models import User, UserRead, UserCreate, TokenWithUser
+from database.models import (
+    User,
+    UserRead,
+    UserCreate,
+    TokenWithUser,
+    RefreshRequest,
+)
 from database.connection import SessionDep
 from sqlmodel import select
 from utils.hashing import Hash
 from datetime import datetime, timezone
 from typing import Annotated
-from .oauth2 import create_access_token, get_current_user
+from .oauth2 import (
+    create_access_token,
+    issue_refresh_token,
+    rotate_refresh_token,
+    revoke_refresh_token,
+    get_current_user,
+)
 
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
@@ -76,10 +88,12 @@ def sign_in(
         )
 
     access_token = create_access_token(data={"sub": user.username})
+    refresh_token = issue_refresh_token(session, user.id)
 
     return TokenWithUser(
         access_token=access_token,
         token_type="bearer",
+        refresh_token=refresh_token,
         user=UserRead(
             id=user.id,
             username=user.username,
@@ -90,6 +104,63 @@ def sign_in(
     )
 
 
+def get_refresh_token_from_request(request: Request, body: RefreshRequest | None):
+    token = body.refresh_token if body and body.refresh_token else None
+    if not token:
+        token = request.cookies.get("refresh_token")
+
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return token
+
+
+@router.post("/refresh", response_model=TokenWithUser)
+def refresh(
+    request: Request,
+    session: SessionDep,
+    body: RefreshRequest | None = None,
+):
+    token = get_refresh_token_from_request(request, body)
+
+    try:
+        user, refresh_token = rotate_refresh_token(session, token)
+    except OperationalError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server waking up, please try again soon.",
+        )
+
+    access_token = create_access_token(data={"sub": user.username})
+
+    return TokenWithUser(
+        access_token=access_token,
+        token_type="bearer",
+        refresh_token=refresh_token,
+        user=UserRead(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            role=user.role,
+            created_at=user.created_at,
+        ),
+    )
+
+
+@router.post("/sign-out")
+def sign_out(
+    request: Request,
+    session: SessionDep,
+    body: RefreshRequest | None = None,
+):
+    token = get_refresh_token_from_request(request, body)
+    revoke_refresh_token(session, token)
+    return {"ok": True}
+
+
 @router.get("/me")
 def read_users_me(current_user: Annotated[UserRead, Depends(get_current_user)]):
     return current_user
@@ -1,16 +1,28 @@
-from fastapi import HTTPException, status, Request
+from fastapi import Depends, HTTPException, status, Request, Response
 from fastapi.security import OAuth2PasswordBearer
-from sqlmodel import select
-from database.connection import SessionDep
-from database.models import TokenData, User, UserRead
+from sqlmodel import Session, delete, select, update
+from database.connection import SessionDep, mark_recent_write, read_your_writes_seconds
+from database.sharding import (
+    ShardMovingError,
+    engine_for_user,
+    get_shard_read_session_for,
+    has_read_replica,
+)
+from database.models import TokenData, User, UserRead, RefreshToken
+from utils.dates import as_utc
 from datetime import datetime, timezone, timedelta
 from jose import JWTError, jwt
 import os
+import math
+import hashlib
+import secrets
 from pathlib import Path
+from typing import Annotated
 
 secret_key = os.getenv("SECRET_KEY")
 algorithm = os.getenv("ALGORITHM")
 access_token_expire_minutes = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+refresh_token_expire_days = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
@@ -24,6 +36,130 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 
+def hash_refresh_token(token: str):
+    # A refresh token véletlen string, ezért elég egy gyors SHA-256 (nem kell bcrypt)
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def create_refresh_token(
+    session: Session, user_id: int, family_id: str | None = None
+):
+    """
+    Új refresh tokent ad ki; family_id nélkül új láncot (bejelentkezést) kezd.
+    Commit nélkül a hívó tranzakciójában marad, a flush után a db_token.id ismert.
+    """
+    token = secrets.token_urlsafe(32)
+    now = datetime.now(timezone.utc)
+
+    # A lejárt tokenekre már a lopásfelismeréshez sincs szükség
+    session.exec(
+        delete(RefreshToken).where(
+            RefreshToken.user_id == user_id, RefreshToken.expires_at <= now
+        )
+    )
+
+    db_token = RefreshToken(
+        token_hash=hash_refresh_token(token),
+        user_id=user_id,
+        family_id=family_id or secrets.token_hex(16),
+        created_at=now,
+        expires_at=now + timedelta(days=refresh_token_expire_days),
+    )
+    session.add(db_token)
+    session.flush()
+    return token, db_token
+
+
+def issue_refresh_token(session: Session, user_id: int):
+    token, _ = create_refresh_token(session, user_id)
+    session.commit()
+    return token
+
+
+def revoke_refresh_token_family(session: Session, db_token: RefreshToken):
+    # Csak az adott bejelentkezés láncát vonjuk vissza, a többi eszköz munkamenetét nem
+    if db_token.family_id is None:
+        condition = RefreshToken.id == db_token.id
+    else:
+        condition = RefreshToken.family_id == db_token.family_id
+
+    session.exec(
+        update(RefreshToken)
+        .where(condition, RefreshToken.revoked_at == None)
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+    session.commit()
+
+
+def get_refresh_token_row(session: Session, token: str):
+    statement = select(RefreshToken).where(
+        RefreshToken.token_hash == hash_refresh_token(token)
+    )
+    return session.exec(statement).first()
+
+
+def rotate_refresh_token(session: Session, token: str):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    db_token = get_refresh_token_row(session, token)
+
+    if db_token is None:
+        raise credentials_exception
+
+    if db_token.revoked_at is not None:
+        if db_token.replaced_by_id is not None:
+            # Már lecserélt token újrahasználása: valószínűleg ellopták, a láncot visszavonjuk
+            revoke_refresh_token_family(session, db_token)
+        # kijelentkezéssel visszavont token: egyszerűen érvénytelen
+        raise credentials_exception
+
+    now = datetime.now(timezone.utc)
+    if as_utc(db_token.expires_at) <= now:
+        raise credentials_exception
+
+    user = session.get(User, db_token.user_id)
+    if user is None or user.role != "admin":
+        raise credentials_exception
+
+    # Csúszó munkamenet: minden frissítés új, teljes élettartamú refresh tokent ad
+    # ugyanabban a láncban
+    new_token, new_db_token = create_refresh_token(
+        session, user.id, family_id=db_token.family_id
+    )
+
+    # Feltételes UPDATE: két párhuzamos frissítés közül csak az egyik nyerhet
+    result = session.exec(
+        update(RefreshToken)
+        .where(RefreshToken.id == db_token.id, RefreshToken.revoked_at == None)
+        .values(revoked_at=now, replaced_by_id=new_db_token.id)
+    )
+    if result.rowcount == 0:
+        session.rollback()
+        db_token = get_refresh_token_row(session, token)
+        if db_token is not None and db_token.replaced_by_id is not None:
+            revoke_refresh_token_family(session, db_token)
+        raise credentials_exception
+
+    session.commit()
+    return user, new_token
+
+
+def revoke_refresh_token(session: Session, token: str):
+    session.exec(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == hash_refresh_token(token),
+            RefreshToken.revoked_at == None,
+        )
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+    session.commit()
+
+
 def get_current_user(
     request: Request,
     session: SessionDep,
@@ -66,6 +202,70 @@ def get_current_user(
     )
 
 
+def shard_moving_exception():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Your data is being moved, please try again soon.",
+        headers={"Retry-After": "5"},
+    )
+
+
+def get_shard_session(current_user: Annotated[UserRead, Depends(get_current_user)]):
+    try:
+        shard_engine = engine_for_user(current_user.id, write=True)
+    except ShardMovingError:
+        raise shard_moving_exception()
+
+    with Session(shard_engine) as session:
+        yield session
+
+
+READ_PIN_COOKIE = "read_pin"
+
+
+def pin_reads_to_primary(response: Response, user_id: int):
+    # Aláírt, rövid életű cookie: bármelyik worker kapja a következő olvasást,
+    # a kliens saját írásai után a primary-ról olvas. Replica nélkül (vagy
+    # shardolt módban) minden olvasás eleve a primary-ra megy.
+    if not has_read_replica():
+        return
+    mark_recent_write(user_id)
+
+    expire = datetime.now(timezone.utc) + timedelta(seconds=read_your_writes_seconds)
+    token = jwt.encode({"pin": user_id, "exp": expire}, secret_key, algorithm=algorithm)
+    response.set_cookie(
+        READ_PIN_COOKIE,
+        token,
+        max_age=math.ceil(read_your_writes_seconds),
+        httponly=True,
+        secure=True,
+        samesite="none",
+    )
+
+
+def has_read_pin(request: Request, user_id: int):
+    token = request.cookies.get(READ_PIN_COOKIE)
+    if not token:
+        return False
+    try:
+        payload = jwt.decode(token, secret_key, algorithms=[algorithm])
+    except JWTError:
+        return False
+    return payload.get("pin") == user_id
+
+
+def get_read_session(
+    request: Request,
+    current_user: Annotated[UserRead, Depends(get_current_user)],
+):
+    pinned = has_read_pin(request, current_user.id)
+    yield from get_shard_read_session_for(current_user.id, pinned)
+
+
+ShardSessionDep = Annotated[Session, Depends(get_shard_session)]
+ReadSessionDep = Annotated[Session, Depends(get_read_session)]
+
+
 def verify_token(token: str):
     try:
         payload = jwt.decode(token, secret_key, algorithms=[algorithm])
@@ -1,6 +1,5 @@
 from fastapi import APIRouter, Depends, status, HTTPException, Response, Query
 from fastapi.responses import StreamingResponse
-from database.connection import SessionDep
 from database.models import (
     Todo,
     TodoCreate,
@@ -13,9 +12,19 @@ from sqlmodel import select, func
 from enum import Enum
 from typing import Annotated, List, Optional
 from datetime import datetime, timezone, timedelta
-from routers.auth.oauth2 import get_current_user
+from database.sharding import ShardMovingError
+from routers.auth.oauth2 import (
+    get_current_user,
+    pin_reads_to_primary,
+    shard_moving_exception,
+    ReadSessionDep,
+    ShardSessionDep,
+)
 from zoneinfo import ZoneInfo
 from io import BytesIO
+from utils.export import EXPORT_COLUMNS, export_todos
+from utils.deadline_scheduler import deadline_scheduler
+from utils.write_coalescing import apply_todo_update, todo_update_coalescer, TodoNotFound
 import pandas as pd
 
 router = APIRouter(prefix="/todos", tags=["todos"])
@@ -33,10 +42,33 @@ class CategoryEnum(str, Enum):
     development = "development"
 
 
+class ExportFormat(str, Enum):
+    xlsx = "xlsx"
+    parquet = "parquet"
+    arrow = "arrow"
+    csv = "csv"
+
+
+def columnar_export_response(session, statements, format: ExportFormat, basename: str):
+    output, media_type, extension = export_todos(
+        session.get_bind(), statements, format.value
+    )
+    filename = f"{basename}.{extension}"
+
+    return StreamingResponse(
+        output,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Type": media_type,
+        },
+    )
+
+
 @router.get("/", response_model=TodoListResponse)
 def get_todos(
     current_user: Annotated[User, Depends(get_current_user)],
-    session: SessionDep,
+    session: ReadSessionDep,
     period: str | None = None,
     category: Annotated[Optional[List[CategoryEnum]], Query()] = None,
     status: Annotated[Optional[List[StatusEnum]], Query()] = None,
@@ -101,7 +133,7 @@ def get_todos(
 
 @router.get("/report/daily")
 def get_todays_todos(
-    current_user: Annotated[User, Depends(get_current_user)], session: SessionDep
+    current_user: Annotated[User, Depends(get_current_user)], session: ReadSessionDep
 ):
     now = datetime.now(timezone.utc)
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
@@ -131,7 +163,7 @@ def get_todays_todos(
 
 @router.get("/report/weekly")
 def get_todays_todos(
-    current_user: Annotated[User, Depends(get_current_user)], session: SessionDep
+    current_user: Annotated[User, Depends(get_current_user)], session: ReadSessionDep
 ):
     now = datetime.now(timezone.utc)
 
@@ -166,26 +198,42 @@ def get_todays_todos(
 
 @router.get("/report/daily/export")
 def get_todays_todos(
-    current_user: Annotated[User, Depends(get_current_user)], session: SessionDep
+    current_user: Annotated[User, Depends(get_current_user)],
+    session: ReadSessionDep,
+    format: ExportFormat = Query(ExportFormat.xlsx),
 ):
     now = datetime.now(timezone.utc)
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
     today_end = today_start + timedelta(days=1)
 
-    done_stmt = select(Todo).where(
+    done_filters = (
         Todo.user_id == current_user.id,
         Todo.status == "done",
         Todo.completed_at >= today_start,
         Todo.completed_at < today_end,
     )
-    done_todos = session.exec(done_stmt).all()
-
-    due_stmt = select(Todo).where(
+    due_filters = (
         Todo.user_id == current_user.id,
         Todo.status != "done",
         Todo.deadline >= today_start,
         Todo.deadline < today_end,
     )
+
+    if format != ExportFormat.xlsx:
+        return columnar_export_response(
+            session,
+            [
+                ("done_today", select(*EXPORT_COLUMNS).where(*done_filters)),
+                ("due_today", select(*EXPORT_COLUMNS).where(*due_filters)),
+            ],
+            format,
+            f"daily_report_{now.date()}",
+        )
+
+    done_stmt = select(Todo).where(*done_filters)
+    done_todos = session.exec(done_stmt).all()
+
+    due_stmt = select(Todo).where(*due_filters)
     due_todos = session.exec(due_stmt).all()
 
     # service
@@ -240,7 +288,9 @@ def get_todays_todos(
 
 @router.get("/report/weekly/export")
 def get_todays_todos(
-    current_user: Annotated[User, Depends(get_current_user)], session: SessionDep
+    current_user: Annotated[User, Depends(get_current_user)],
+    session: ReadSessionDep,
+    format: ExportFormat = Query(ExportFormat.xlsx),
 ):
     now = datetime.now(timezone.utc)
 
@@ -251,20 +301,34 @@ def get_todays_todos(
     # Hét vége (vasárnap 23:59:59)
     week_end = week_start + timedelta(days=7)
 
-    done_stmt = select(Todo).where(
+    done_filters = (
         Todo.user_id == current_user.id,
         Todo.status == "done",
         Todo.completed_at >= week_start,
         Todo.completed_at < week_end,
     )
-    done_todos = session.exec(done_stmt).all()
-
-    due_stmt = select(Todo).where(
+    due_filters = (
         Todo.user_id == current_user.id,
         Todo.status != "done",
         Todo.deadline >= week_start,
         Todo.deadline < week_end,
     )
+
+    if format != ExportFormat.xlsx:
+        return columnar_export_response(
+            session,
+            [
+                ("done_weekly", select(*EXPORT_COLUMNS).where(*done_filters)),
+                ("due_weekly", select(*EXPORT_COLUMNS).where(*due_filters)),
+            ],
+            format,
+            f"weekly_report_{now.date()}",
+        )
+
+    done_stmt = select(Todo).where(*done_filters)
+    done_todos = session.exec(done_stmt).all()
+
+    due_stmt = select(Todo).where(*due_filters)
     due_todos = session.exec(due_stmt).all()
 
     # service
@@ -318,11 +382,36 @@ def get_todays_todos(
     )
 
 
+@router.get("/export")
+def export_all_todos(
+    current_user: Annotated[User, Depends(get_current_user)],
+    session: ReadSessionDep,
+    format: ExportFormat = Query(ExportFormat.parquet),
+):
+    if format == ExportFormat.xlsx:
+        raise HTTPException(
+            status_code=400,
+            detail="Full-history export supports parquet, arrow and csv formats.",
+        )
+
+    now = datetime.now(timezone.utc)
+    statement = (
+        select(*EXPORT_COLUMNS)
+        .where(Todo.user_id == current_user.id)
+        .order_by(Todo.id)
+    )
+
+    return columnar_export_response(
+        session, [(None, statement)], format, f"todos_export_{now.date()}"
+    )
+
+
 @router.post("/create", status_code=status.HTTP_201_CREATED)
 def create_todo(
     todo: TodoCreate,
     current_user: Annotated[User, Depends(get_current_user)],
-    session: SessionDep,
+    session: ShardSessionDep,
+    response: Response,
 ):
     todo_data = todo.model_dump()
 
@@ -334,7 +423,9 @@ def create_todo(
 
     session.add(db_todo)
     session.commit()
+    pin_reads_to_primary(response, current_user.id)
     session.refresh(db_todo)
+    deadline_scheduler.track(db_todo)
     return db_todo
 
 
@@ -342,13 +433,16 @@ def create_todo(
 def delete_todo(
     todo_id: int,
     current_user: Annotated[User, Depends(get_current_user)],
-    session: SessionDep,
+    session: ShardSessionDep,
+    response: Response,
 ):
     todo = session.get(Todo, todo_id)
     if not todo or todo.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Todo not found")
     session.delete(todo)
     session.commit()
+    pin_reads_to_primary(response, current_user.id)
+    deadline_scheduler.untrack(current_user.id, todo_id)
     return {"ok": True}
 
 
@@ -357,28 +451,32 @@ def update_todo(
     todo_id: int,
     todo_update: TodoUpdate,
     current_user: Annotated[User, Depends(get_current_user)],
-    session: SessionDep,
+    session: ShardSessionDep,
+    response: Response,
 ):
+    update_data = todo_update.model_dump(exclude_unset=True)
+
+    # Opcionális: a gyors egymás utáni módosítások egy commitba kerülnek
+    if todo_update_coalescer.enabled:
+        try:
+            result = todo_update_coalescer.submit(current_user.id, todo_id, update_data)
+        except TodoNotFound:
+            raise HTTPException(status_code=404, detail="Todo not found")
+        except ShardMovingError:
+            raise shard_moving_exception()
+        pin_reads_to_primary(response, current_user.id)
+        return result
+
     db_todo = session.get(Todo, todo_id)
 
     if not db_todo or db_todo.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Todo not found")
 
-    update_data = todo_update.model_dump(exclude_unset=True)
-
-    new_status = update_data.get("status")
-    if new_status is not None:
-        if new_status == "done":
-            db_todo.completed_at = datetime.now(timezone.utc)
-        else:
-            db_todo.completed_at = None
-
-    for field, value in update_data.items():
-        setattr(db_todo, field, value)
-
-    db_todo.modified_at = datetime.now(timezone.utc)
+    apply_todo_update(db_todo, update_data, datetime.now(timezone.utc))
 
     session.add(db_todo)
     session.commit()
+    pin_reads_to_primary(response, current_user.id)
     session.refresh(db_todo)
+    deadline_scheduler.track(db_todo)
     return db_todo
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from typing import Annotated
 from database.models import User, UserRead, UserUpdate
-from routers.auth.oauth2 import get_current_user
+from routers.auth.oauth2 import get_current_user, pin_reads_to_primary
 from database.connection import SessionDep
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
@@ -13,6 +13,7 @@ def update_user(
     user_update: UserUpdate,
     current_user: Annotated[User, Depends(get_current_user)],
     session: SessionDep,
+    response: Response,
 ):
     update_data = user_update.model_dump(exclude_unset=True)
 
@@ -33,6 +34,7 @@ def update_user(
 
     try:
         session.commit()
+        pin_reads_to_primary(response, current_user.id)
         session.refresh(db_user)
     except IntegrityError as e:
         session.rollback()
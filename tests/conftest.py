@@ -0,0 +1,49 @@
+import os
+import tempfile
+
+# A modulok import időben olvassák a környezetet, ezért mindent előtte állítunk be:
+# egy primary és két shard SQLite fájl
+_db_dir = tempfile.mkdtemp(prefix="todo-tests-")
+os.environ.update(
+    {
+        "DATABASE_URL": f"sqlite:///{_db_dir}/primary.db",
+        "DATABASE_SHARD_URLS": (
+            f"a=sqlite:///{_db_dir}/a.db,b=sqlite:///{_db_dir}/b.db"
+        ),
+        "DB_PASSWORD": "",
+        "SECRET_KEY": "test-secret",
+        "ALGORITHM": "HS256",
+        "ACCESS_TOKEN_EXPIRE_MINUTES": "5",
+    }
+)
+
+import pytest
+from sqlalchemy import delete
+from sqlmodel import Session
+from database.connection import engine, create_db_and_tables
+from database.models import Todo, User, UserShard, SchedulerLease, RefreshToken
+from database.sharding import create_shard_tables, shard_engines, invalidate_assignment
+
+
+@pytest.fixture(scope="session", autouse=True)
+def databases():
+    for db_engine in [engine, *shard_engines.values()]:
+        db_engine.echo = False
+    create_db_and_tables()
+    create_shard_tables()
+
+
+@pytest.fixture(autouse=True)
+def clean_databases(databases):
+    yield
+    for db_engine in [engine, *shard_engines.values()]:
+        with Session(db_engine) as session:
+            session.exec(delete(Todo))
+            session.commit()
+    with Session(engine) as session:
+        session.exec(delete(UserShard))
+        session.exec(delete(SchedulerLease))
+        session.exec(delete(RefreshToken))
+        session.exec(delete(User))
+        session.commit()
+    invalidate_assignment()
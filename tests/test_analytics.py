@@ -0,0 +1,116 @@
+from datetime import datetime, timezone, timedelta
+from sqlmodel import Session, update
+from database.connection import engine
+from database.models import Todo, Category, Status
+from database.sharding import shard_engines
+from routers.admin.analytics import compute_analytics
+
+
+def insert(db_engine, **kwargs):
+    values = {
+        "user_id": 1,
+        "title": "analytics todo",
+        "deadline": datetime.now(timezone.utc) + timedelta(days=1),
+    }
+    values.update(kwargs)
+    with Session(db_engine) as session:
+        db_todo = Todo(**values)
+        session.add(db_todo)
+        session.commit()
+        if "priority" in kwargs and kwargs["priority"] is None:
+            # None esetén az INSERT az oszlop alapértelmezését használná
+            session.exec(
+                update(Todo).where(Todo.id == db_todo.id).values(priority=None)
+            )
+            session.commit()
+
+
+def test_summary_merges_shards_and_skips_archived_overdue():
+    past = datetime.now(timezone.utc) - timedelta(days=1)
+
+    insert(shard_engines["a"], category=Category.work, priority=2, deadline=past)
+    insert(
+        shard_engines["a"],
+        category=Category.work,
+        priority=2,
+        deadline=past,
+        archived=True,
+    )
+    insert(
+        shard_engines["b"],
+        category=Category.work,
+        priority=2,
+        status=Status.done,
+        completed_at=past,
+    )
+    insert(shard_engines["b"], category=Category.personal, priority=None)
+    # a shardolás előtti todók a primary-n
+    insert(engine, category=Category.work, priority=2, deadline=past)
+
+    result = compute_analytics(weeks=4)
+
+    assert result["by_category_priority"] == [
+        {
+            "category": "personal",
+            "priority": None,
+            "total": 1,
+            "completed": 0,
+            "overdue": 0,
+            "completion_rate": 0.0,
+        },
+        {
+            "category": "work",
+            "priority": 2,
+            "total": 4,
+            "completed": 1,
+            "overdue": 2,
+            "completion_rate": 0.25,
+        },
+    ]
+    assert result["totals"] == {
+        "total": 5,
+        "completed": 1,
+        "overdue": 2,
+        "completion_rate": 0.2,
+    }
+
+
+def test_weekly_throughput_groups_across_shards():
+    today = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0)
+    monday = today - timedelta(days=today.weekday() + 14)
+
+    for db_engine, offset in [
+        (shard_engines["a"], 0),
+        (shard_engines["b"], 2),
+        (shard_engines["b"], 8),
+    ]:
+        insert(
+            db_engine,
+            category=Category.work,
+            priority=3,
+            status=Status.done,
+            completed_at=monday + timedelta(days=offset),
+        )
+    insert(
+        shard_engines["a"],
+        category=Category.personal,
+        priority=None,
+        status=Status.done,
+        completed_at=monday,
+    )
+    # az időablakon kívül
+    insert(
+        shard_engines["a"],
+        status=Status.done,
+        completed_at=monday - timedelta(weeks=10),
+    )
+
+    result = compute_analytics(weeks=4)
+
+    week = monday.date()
+    next_week = (monday + timedelta(weeks=1)).date()
+    assert result["weekly_throughput"] == [
+        {"week": week, "category": "personal", "priority": None, "completed": 1},
+        {"week": week, "category": "work", "priority": 3, "completed": 2},
+        {"week": next_week, "category": "work", "priority": 3, "completed": 1},
+    ]
@@ -0,0 +1,177 @@
+from datetime import datetime, timezone, timedelta
+from sqlmodel import Session, update
+from database.connection import engine
+from database.models import Todo, SchedulerLease, Status
+from database.sharding import shard_engines
+from utils import deadline_scheduler as scheduler_module
+from utils.deadline_scheduler import DeadlineScheduler
+import pytest
+
+
+def make_scheduler(events=None):
+    scheduler = DeadlineScheduler(
+        sink=(events.append if events is not None else lambda event: None),
+        lead=timedelta(minutes=10),
+        horizon=timedelta(hours=1),
+        resync_interval=timedelta(minutes=5),
+    )
+    scheduler.leader = True
+    return scheduler
+
+
+def todo(todo_id, user_id, minutes, **kwargs):
+    return Todo(
+        id=todo_id,
+        user_id=user_id,
+        title=f"todo {todo_id}",
+        deadline=datetime.now(timezone.utc) + timedelta(minutes=minutes),
+        **kwargs,
+    )
+
+
+def fired_keys(scheduler, minutes_from_now):
+    now = datetime.now(timezone.utc) + timedelta(minutes=minutes_from_now)
+    due, _ = scheduler.pop_due(now)
+    return [(event.user_id, event.todo_id) for event in due]
+
+
+def test_fires_in_deadline_order_once():
+    scheduler = make_scheduler()
+    scheduler.track(todo(1, 1, 40))
+    scheduler.track(todo(2, 1, 20))
+    scheduler.track(todo(3, 2, 30))
+
+    assert fired_keys(scheduler, 5) == []
+    assert fired_keys(scheduler, 25) == [(1, 2), (2, 3)]
+    assert fired_keys(scheduler, 35) == [(1, 1)]
+    assert fired_keys(scheduler, 35) == []
+
+
+def test_same_todo_id_on_different_users_is_tracked_separately():
+    scheduler = make_scheduler()
+    scheduler.track(todo(1, 1, 20))
+    scheduler.track(todo(1, 2, 20))
+
+    assert sorted(fired_keys(scheduler, 15)) == [(1, 1), (2, 1)]
+
+
+def test_untrack_done_and_out_of_horizon_are_skipped():
+    scheduler = make_scheduler()
+    scheduler.track(todo(1, 1, 20))
+    scheduler.track(todo(2, 1, 20))
+    scheduler.track(todo(3, 1, 20))
+    scheduler.track(todo(4, 1, 600))
+
+    scheduler.untrack(1, 1)
+    scheduler.track(todo(2, 1, 20, status=Status.done))
+
+    assert fired_keys(scheduler, 15) == [(1, 3)]
+
+
+def test_moved_deadline_fires_at_new_time_only():
+    scheduler = make_scheduler()
+    scheduler.track(todo(1, 1, 20))
+    scheduler.track(todo(1, 1, 40))
+
+    assert fired_keys(scheduler, 15) == []
+    assert fired_keys(scheduler, 35) == [(1, 1)]
+
+
+def test_follower_does_not_track():
+    scheduler = make_scheduler()
+    scheduler.leader = False
+    scheduler.track(todo(1, 1, 20))
+
+    assert scheduler._heap == []
+
+
+def insert_todo(db_engine, user_id, minutes, **kwargs):
+    with Session(db_engine) as session:
+        db_todo = Todo(
+            user_id=user_id,
+            title="stored todo",
+            deadline=datetime.now(timezone.utc) + timedelta(minutes=minutes),
+            **kwargs,
+        )
+        session.add(db_todo)
+        session.commit()
+        session.refresh(db_todo)
+        return db_todo
+
+
+def test_resync_reads_every_shard():
+    first = insert_todo(shard_engines["a"], 1, 20)
+    second = insert_todo(shard_engines["b"], 2, 20)
+    insert_todo(shard_engines["b"], 2, 20, status=Status.done)
+    insert_todo(shard_engines["b"], 2, 600)
+
+    scheduler = make_scheduler()
+    scheduler.resync()
+
+    assert set(scheduler._entries) == {(1, first.id), (2, second.id)}
+
+
+def test_changes_during_resync_are_not_lost(monkeypatch):
+    stored = insert_todo(shard_engines["a"], 1, 20)
+    scheduler = make_scheduler()
+    real_fan_out = scheduler_module.fan_out
+
+    def fan_out_with_concurrent_writes(fn, engines=None):
+        rows = real_fan_out(fn, engines)
+        # a snapshot lekérdezése és a csere között érkező írások
+        scheduler.track(todo(99, 1, 20))
+        scheduler.untrack(1, stored.id)
+        return rows
+
+    monkeypatch.setattr(scheduler_module, "fan_out", fan_out_with_concurrent_writes)
+    scheduler.resync()
+
+    assert set(scheduler._entries) == {(1, 99)}
+    assert fired_keys(scheduler, 15) == [(1, 99)]
+
+
+def test_overdue_todo_never_fires():
+    scheduler = make_scheduler()
+    overdue = insert_todo(shard_engines["a"], 1, -3 * 24 * 60)
+
+    scheduler.track(overdue)
+    assert fired_keys(scheduler, 0) == []
+
+    scheduler.resync()
+    # pl. Kanban húzás: a lejárt todo minden státuszváltáskor újra track()-et kap
+    overdue.status = Status.progress
+    scheduler.track(overdue)
+    scheduler.track(overdue)
+
+    assert fired_keys(scheduler, 0) == []
+    assert scheduler._entries == {}
+
+
+def test_only_one_scheduler_holds_the_lease():
+    first = make_scheduler()
+    second = make_scheduler()
+
+    assert first.try_acquire_lease()
+    assert not second.try_acquire_lease()
+    assert first.try_acquire_lease()
+
+    with Session(engine) as session:
+        session.exec(
+            update(SchedulerLease).values(
+                expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)
+            )
+        )
+        session.commit()
+
+    assert second.try_acquire_lease()
+    assert not first.try_acquire_lease()
+
+
+def test_released_lease_can_be_taken_over():
+    first = make_scheduler()
+    second = make_scheduler()
+
+    assert first.try_acquire_lease()
+    first.release_lease()
+
+    assert second.try_acquire_lease()
@@ -0,0 +1,97 @@
+from types import SimpleNamespace
+from fastapi import Request, Response
+from database import connection, sharding
+from database.connection import (
+    engine,
+    get_read_session_for,
+    make_engine,
+    mark_recent_write,
+)
+from routers.auth.oauth2 import (
+    READ_PIN_COOKIE,
+    get_read_session,
+    has_read_pin,
+    pin_reads_to_primary,
+)
+import pytest
+
+
+@pytest.fixture
+def replica(monkeypatch, tmp_path):
+    # Shardolás nélküli mód egy külön SQLite fájlba mutató read replicával
+    replica_engine = make_engine(f"sqlite:///{tmp_path}/replica.db")
+    replica_engine.echo = False
+    monkeypatch.setattr(connection, "read_engine", replica_engine)
+    monkeypatch.setattr(sharding, "read_engine", replica_engine)
+    monkeypatch.setattr(sharding, "sharded", False)
+    monkeypatch.setattr(connection, "_recent_writes", {})
+    return replica_engine
+
+
+def bind_for(user_id, pinned=False):
+    return next(get_read_session_for(user_id, pinned)).get_bind()
+
+
+def request_with_cookies(cookies: dict):
+    header = "; ".join(f"{name}={value}" for name, value in cookies.items())
+    return Request({"type": "http", "headers": [(b"cookie", header.encode())]})
+
+
+def read_pin_from(response: Response):
+    cookies = response.headers.getlist("set-cookie")
+    assert len(cookies) == 1
+    name, _, rest = cookies[0].partition("=")
+    assert name == READ_PIN_COOKIE
+    return rest.split(";")[0]
+
+
+def test_reads_go_to_replica_without_pin(replica):
+    assert bind_for(31) is replica
+
+
+def test_recent_write_pins_reads_to_primary(replica):
+    mark_recent_write(31)
+
+    assert bind_for(31) is engine
+    assert bind_for(32) is replica
+
+
+def test_explicit_pin_reads_from_primary(replica):
+    assert bind_for(31, pinned=True) is engine
+
+
+def test_read_pin_cookie_routes_to_primary_on_any_worker(replica, monkeypatch):
+    response = Response()
+    pin_reads_to_primary(response, 31)
+    token = read_pin_from(response)
+
+    # egy másik worker: nincs helyi nyoma az írásnak
+    monkeypatch.setattr(connection, "_recent_writes", {})
+    request = request_with_cookies({READ_PIN_COOKIE: token})
+
+    assert has_read_pin(request, 31)
+    assert not has_read_pin(request, 32)
+    assert next(get_read_session(request, SimpleNamespace(id=31))).get_bind() is engine
+    assert (
+        next(get_read_session(request, SimpleNamespace(id=32))).get_bind() is replica
+    )
+
+
+def test_forged_read_pin_is_ignored(replica):
+    request = request_with_cookies({READ_PIN_COOKIE: "not-a-token"})
+
+    assert not has_read_pin(request, 31)
+    assert next(get_read_session(request, SimpleNamespace(id=31))).get_bind() is replica
+
+
+def test_no_read_pin_without_replica(monkeypatch):
+    # shardolt mód (a tesztek alapbeállítása)
+    response = Response()
+    pin_reads_to_primary(response, 31)
+    assert response.headers.getlist("set-cookie") == []
+
+    # shardolás nélkül, replica nélkül
+    monkeypatch.setattr(sharding, "sharded", False)
+    monkeypatch.setattr(sharding, "read_engine", engine)
+    pin_reads_to_primary(response, 31)
+    assert response.headers.getlist("set-cookie") == []
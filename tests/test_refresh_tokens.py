@@ -0,0 +1,137 @@
+from datetime import datetime, timezone, timedelta
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select, update
+from database.connection import engine
+from database.models import RefreshToken, Role, User
+from routers.auth import authentication, oauth2
+from utils.hashing import Hash
+import pytest
+
+PASSWORD = "secret-password"
+
+app = FastAPI()
+app.include_router(authentication.router)
+
+
+@pytest.fixture
+def client():
+    with Session(engine) as session:
+        session.add(
+            User(
+                username="admin-user",
+                hashed_password=Hash.bcrypt(PASSWORD),
+                role=Role.admin,
+            )
+        )
+        session.commit()
+    return TestClient(app)
+
+
+def sign_in(client):
+    response = client.post(
+        "/auth/sign-in", data={"username": "admin-user", "password": PASSWORD}
+    )
+    assert response.status_code == 200
+    return response.json()["refresh_token"]
+
+
+def refresh(client, token):
+    return client.post("/auth/refresh", json={"refresh_token": token})
+
+
+def token_row(token):
+    with Session(engine) as session:
+        return oauth2.get_refresh_token_row(session, token)
+
+
+def test_refresh_rotates_within_the_same_sign_in(client):
+    first = sign_in(client)
+
+    response = refresh(client, first)
+    assert response.status_code == 200
+    second = response.json()["refresh_token"]
+
+    old, new = token_row(first), token_row(second)
+    assert old.revoked_at is not None
+    assert old.replaced_by_id == new.id
+    assert old.family_id == new.family_id
+    assert new.revoked_at is None
+    assert refresh(client, second).status_code == 200
+
+
+def test_reused_rotated_token_revokes_only_its_chain(client):
+    device_a = sign_in(client)
+    device_b = sign_in(client)
+
+    rotated_a = refresh(client, device_a).json()["refresh_token"]
+
+    # a régi (már lecserélt) token újra felbukkan: lopás
+    assert refresh(client, device_a).status_code == 401
+    assert refresh(client, rotated_a).status_code == 401
+    assert refresh(client, device_b).status_code == 200
+
+
+def test_signed_out_token_does_not_revoke_other_sessions(client):
+    device_a = sign_in(client)
+    device_b = sign_in(client)
+
+    response = client.post("/auth/sign-out", json={"refresh_token": device_a})
+    assert response.json() == {"ok": True}
+    assert token_row(device_a).replaced_by_id is None
+
+    assert refresh(client, device_a).status_code == 401
+    assert refresh(client, device_b).status_code == 200
+
+
+def test_expired_token_is_rejected_and_cleaned_up(client):
+    token = sign_in(client)
+    with Session(engine) as session:
+        session.exec(
+            update(RefreshToken).values(
+                expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)
+            )
+        )
+        session.commit()
+
+    assert refresh(client, token).status_code == 401
+
+    # a következő kiadás törli a felhasználó lejárt tokenjeit
+    sign_in(client)
+    assert token_row(token) is None
+    with Session(engine) as session:
+        assert len(session.exec(select(RefreshToken)).all()) == 1
+
+
+def test_concurrent_refresh_with_the_same_token(client, monkeypatch):
+    token = sign_in(client)
+    original = oauth2.create_refresh_token
+    winner = {}
+
+    def create_after_concurrent_rotation(session, user_id, family_id=None):
+        # a másik kérés a feltételes UPDATE előtt cseréli le ugyanazt a tokent
+        if "token" not in winner:
+            winner["token"] = None
+            with Session(engine) as other:
+                winner["token"] = oauth2.rotate_refresh_token(other, token)[1]
+        return original(session, user_id, family_id)
+
+    monkeypatch.setattr(
+        oauth2, "create_refresh_token", create_after_concurrent_rotation
+    )
+
+    assert refresh(client, token).status_code == 401
+    assert winner["token"]
+
+    # a vesztes kérés nem hagy maga után élő tokent, és a lánc visszavonásra került
+    with Session(engine) as session:
+        live = session.exec(
+            select(RefreshToken).where(RefreshToken.revoked_at == None)
+        ).all()
+    assert live == []
+    assert token_row(token).replaced_by_id == token_row(winner["token"]).id
+
+
+def test_unknown_token_is_rejected(client):
+    assert refresh(client, "not-a-real-token").status_code == 401
+    assert client.post("/auth/refresh").status_code == 401
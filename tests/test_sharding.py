@@ -0,0 +1,230 @@
+from datetime import datetime, timezone, timedelta
+from types import SimpleNamespace
+from fastapi import HTTPException
+from sqlmodel import Session, select
+from database import rebalance
+from database.connection import engine
+from database.models import Todo, UserShard
+from database.sharding import (
+    PRIMARY_SHARD,
+    HashRing,
+    ShardMovingError,
+    engine_for_user,
+    invalidate_assignment,
+    lookup_assignment,
+    ring,
+    routing_engines,
+    shard_engines,
+    shard_for_user,
+)
+from routers.auth.oauth2 import get_shard_session
+import pytest
+
+
+def insert_todos(db_engine, user_id, count=2):
+    with Session(db_engine) as session:
+        for i in range(count):
+            session.add(
+                Todo(
+                    user_id=user_id,
+                    title=f"todo {i}",
+                    deadline=datetime.now(timezone.utc) + timedelta(days=1),
+                )
+            )
+        session.commit()
+
+
+def titles(db_engine, user_id):
+    with Session(db_engine) as session:
+        statement = select(Todo.title).where(Todo.user_id == user_id)
+        return sorted(session.exec(statement).all())
+
+
+def directory_row(user_id):
+    with Session(engine) as session:
+        return session.get(UserShard, user_id)
+
+
+def other_shard(user_id):
+    return next(name for name in shard_engines if name != ring.get(user_id))
+
+
+def assign_off_ring(user_id):
+    # a felhasználó nem a ring szerinti shardon van (pl. új shard felvétele után)
+    with Session(engine) as session:
+        session.add(UserShard(user_id=user_id, shard=other_shard(user_id)))
+        session.commit()
+    return other_shard(user_id), ring.get(user_id)
+
+
+def test_ring_is_deterministic_and_uses_every_shard():
+    again = HashRing(shard_engines)
+    assignments = [ring.get(user_id) for user_id in range(1000)]
+
+    assert assignments == [again.get(user_id) for user_id in range(1000)]
+    assert set(assignments) == set(shard_engines)
+
+
+def test_adding_a_shard_only_moves_users_to_it():
+    grown = HashRing([*shard_engines, "c"])
+
+    for user_id in range(1000):
+        before, after = ring.get(user_id), grown.get(user_id)
+        assert after == before or after == "c"
+
+
+def test_directory_assignment_is_persisted_and_cached():
+    assert shard_for_user(7) == ring.get(7)
+    assert directory_row(7).shard == ring.get(7)
+
+    # a cache-elt bejegyzés a directory változásáig (invalidálásig) él
+    with Session(engine) as session:
+        row = session.get(UserShard, 7)
+        row.shard = other_shard(7)
+        session.add(row)
+        session.commit()
+    assert shard_for_user(7) == ring.get(7)
+
+    invalidate_assignment(7)
+    assert shard_for_user(7) == other_shard(7)
+
+
+def test_legacy_primary_todos_route_to_primary():
+    insert_todos(engine, 8)
+
+    assert lookup_assignment(8) == (PRIMARY_SHARD, False)
+    assert engine_for_user(8) is engine
+
+
+def test_move_user_copies_and_deletes():
+    source = shard_for_user(9)
+    target = other_shard(9)
+    insert_todos(shard_engines[source], 9, count=3)
+
+    assert rebalance.move_user(9, target, grace_seconds=0) == 3
+
+    assert titles(shard_engines[target], 9) == ["todo 0", "todo 1", "todo 2"]
+    assert titles(shard_engines[source], 9) == []
+    assert lookup_assignment(9) == (target, False)
+
+
+def test_move_user_replaces_leftovers_on_target():
+    source = shard_for_user(10)
+    target = other_shard(10)
+    insert_todos(shard_engines[source], 10)
+    # egy korábbi, félbeszakadt futás másolata
+    insert_todos(shard_engines[target], 10)
+
+    rebalance.move_user(10, target, grace_seconds=0)
+
+    assert titles(shard_engines[target], 10) == ["todo 0", "todo 1"]
+
+
+def test_failed_move_stays_fenced_and_rerun_completes(monkeypatch):
+    source, target = assign_off_ring(11)
+    insert_todos(shard_engines[source], 11)
+
+    original = rebalance.set_assignments
+
+    def fail_on_flip(user_ids, shard=None, moving=False):
+        if shard is not None:
+            raise RuntimeError("directory unavailable")
+        original(user_ids, shard, moving)
+
+    monkeypatch.setattr(rebalance, "set_assignments", fail_on_flip)
+    with pytest.raises(RuntimeError):
+        rebalance.move_user(11, target, grace_seconds=0)
+
+    # a másolat már a célon van, de a felhasználó a forráson maradt, írásra zárva
+    assert lookup_assignment(11) == (source, True)
+    with pytest.raises(ShardMovingError):
+        engine_for_user(11, write=True)
+    with pytest.raises(HTTPException) as error:
+        next(get_shard_session(SimpleNamespace(id=11)))
+    assert error.value.status_code == 503
+
+    monkeypatch.setattr(rebalance, "set_assignments", original)
+    assert (11, source, target) in rebalance.plan_moves()
+    rebalance.move_user(11, target, grace_seconds=0)
+
+    assert titles(shard_engines[target], 11) == ["todo 0", "todo 1"]
+    assert titles(shard_engines[source], 11) == []
+    assert lookup_assignment(11) == (target, False)
+
+
+def test_failed_cleanup_is_finished_by_rerun(monkeypatch):
+    source, target = assign_off_ring(12)
+    insert_todos(shard_engines[source], 12)
+
+    original = rebalance.set_assignments
+
+    def fail_on_unfence(user_ids, shard=None, moving=False):
+        if shard is None and not moving:
+            raise RuntimeError("directory unavailable")
+        original(user_ids, shard, moving)
+
+    monkeypatch.setattr(rebalance, "set_assignments", fail_on_unfence)
+    with pytest.raises(RuntimeError):
+        rebalance.move_user(12, target, grace_seconds=0)
+    monkeypatch.setattr(rebalance, "set_assignments", original)
+
+    assert lookup_assignment(12) == (target, True)
+    assert (12, target, target) in rebalance.plan_moves()
+
+    rebalance.move_user(12, target, grace_seconds=0)
+    assert lookup_assignment(12) == (target, False)
+    assert titles(shard_engines[target], 12) == ["todo 0", "todo 1"]
+
+
+def test_from_primary_migrates_legacy_todos():
+    insert_todos(engine, 13)
+    insert_todos(engine, 14, count=1)
+
+    moves = rebalance.plan_moves(from_primary=True)
+    assert sorted(moves) == [
+        (13, PRIMARY_SHARD, ring.get(13)),
+        (14, PRIMARY_SHARD, ring.get(14)),
+    ]
+    # --from-primary nélkül a régi felhasználók kimaradnak
+    assert rebalance.plan_moves() == []
+
+    rebalance.move_batch([(user_id, target) for user_id, _, target in moves], 0)
+
+    assert titles(engine, 13) == []
+    assert titles(shard_engines[ring.get(13)], 13) == ["todo 0", "todo 1"]
+    assert titles(shard_engines[ring.get(14)], 14) == ["todo 0"]
+    assert lookup_assignment(13) == (ring.get(13), False)
+
+
+def test_batch_waits_once_per_phase(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(rebalance.time, "sleep", sleeps.append)
+
+    insert_todos(engine, 16)
+    lookup_assignment(16)
+    moves = [(16, ring.get(16))]
+    for user_id in range(17, 27):
+        source, target = assign_off_ring(user_id)
+        insert_todos(shard_engines[source], user_id, count=user_id % 3)
+        moves.append((user_id, target))
+
+    counts = rebalance.move_batch(moves, grace_seconds=7)
+
+    # egy várakozás a kerítés után, egy a directory átállítása után
+    assert sleeps == [7, 7]
+    assert counts == {16: 2, **{user_id: user_id % 3 for user_id in range(17, 27)}}
+    for user_id, target in moves:
+        assert lookup_assignment(user_id) == (target, False)
+        assert len(titles(shard_engines[target], user_id)) == counts[user_id]
+    assert rebalance.plan_moves(from_primary=True) == []
+
+
+def test_writes_are_rejected_while_moving():
+    shard_for_user(15)
+    rebalance.set_assignments([15], moving=True)
+
+    assert engine_for_user(15) is routing_engines[ring.get(15)]
+    with pytest.raises(HTTPException) as error:
+        next(get_shard_session(SimpleNamespace(id=15)))
+    assert error.value.status_code == 503
+    assert error.value.headers["Retry-After"] == "5"
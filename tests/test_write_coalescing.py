@@ -0,0 +1,198 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+from sqlalchemy import event
+from sqlmodel import Session
+from database.models import Todo, Status
+from database.sharding import engine_for_user
+from utils import write_coalescing as coalescing_module
+from utils.write_coalescing import TodoUpdateCoalescer, TodoNotFound
+import pytest
+import threading
+import time
+
+WINDOW = 0.05
+USER_ID = 21
+
+
+def insert_todo(user_id=USER_ID, title="first todo"):
+    with Session(engine_for_user(user_id)) as session:
+        db_todo = Todo(
+            user_id=user_id,
+            title=title,
+            deadline=datetime.now(timezone.utc) + timedelta(days=1),
+        )
+        session.add(db_todo)
+        session.commit()
+        session.refresh(db_todo)
+        return db_todo.id
+
+
+def stored_title(todo_id, user_id=USER_ID):
+    with Session(engine_for_user(user_id)) as session:
+        return session.get(Todo, todo_id).title
+
+
+def submit_all(coalescer, updates, user_id=USER_ID, stagger=0.005):
+    """
+    (todo_id, update_data) párokat küld be külön szálakon, érkezési sorrendben.
+    Visszatér: hívásonként az eredmény vagy a kivétel.
+    """
+
+    def call(todo_id, update_data):
+        try:
+            return coalescer.submit(user_id, todo_id, update_data)
+        except Exception as exc:
+            return exc
+
+    with ThreadPoolExecutor(max_workers=len(updates)) as executor:
+        futures = []
+        for todo_id, update_data in updates:
+            futures.append(executor.submit(call, todo_id, update_data))
+            time.sleep(stagger)
+        return [future.result() for future in futures]
+
+
+@pytest.fixture
+def commits():
+    shard_engine = engine_for_user(USER_ID)
+    counter = []
+
+    def on_commit(connection):
+        counter.append(connection)
+
+    event.listen(shard_engine, "commit", on_commit)
+    yield counter
+    event.remove(shard_engine, "commit", on_commit)
+
+
+def test_burst_is_committed_once_and_last_write_wins(commits):
+    todo_id = insert_todo()
+    other_id = insert_todo(title="second todo")
+    commits.clear()
+
+    results = submit_all(
+        TodoUpdateCoalescer(WINDOW),
+        [
+            (todo_id, {"title": "title one"}),
+            (other_id, {"status": Status.done}),
+            (todo_id, {"title": "title two", "priority": 3}),
+        ],
+    )
+
+    assert len(commits) == 1
+    # minden hívó a saját módosítása utáni állapotot kapja
+    assert results[0]["title"] == "title one"
+    assert results[1]["completed_at"] is not None
+    assert results[2]["title"] == "title two"
+    assert results[2]["priority"] == 3
+    assert stored_title(todo_id) == "title two"
+
+
+def test_consecutive_batches_commit_in_order(monkeypatch):
+    todo_id = insert_todo()
+    coalescer = TodoUpdateCoalescer(WINDOW)
+
+    original = coalescer._run
+    first_batch = threading.Event()
+
+    def slow_first_run(user_id, items):
+        # az első batch lassan commitol; a második nem előzheti meg
+        if not first_batch.is_set():
+            first_batch.set()
+            time.sleep(0.2)
+        original(user_id, items)
+
+    monkeypatch.setattr(coalescer, "_run", slow_first_run)
+
+    results = submit_all(
+        coalescer,
+        [(todo_id, {"title": "older title"}), (todo_id, {"title": "newer title"})],
+        stagger=WINDOW * 2,
+    )
+
+    assert [result["title"] for result in results] == ["older title", "newer title"]
+    assert stored_title(todo_id) == "newer title"
+    assert coalescer._tails == {}
+
+
+def test_missing_todo_fails_only_its_own_request(commits):
+    todo_id = insert_todo()
+    foreign_id = insert_todo(user_id=USER_ID + 1)
+    commits.clear()
+
+    results = submit_all(
+        TodoUpdateCoalescer(WINDOW),
+        [
+            (todo_id, {"title": "updated title"}),
+            (999_999, {"title": "missing todo"}),
+            (foreign_id, {"title": "someone else"}),
+        ],
+    )
+
+    assert results[0]["title"] == "updated title"
+    assert isinstance(results[1], TodoNotFound)
+    assert isinstance(results[2], TodoNotFound)
+    assert len(commits) == 1
+    assert stored_title(foreign_id, user_id=USER_ID + 1) == "first todo"
+
+
+def test_failed_commit_falls_back_to_single_updates():
+    todo_id = insert_todo()
+    other_id = insert_todo(title="second todo")
+
+    results = submit_all(
+        TodoUpdateCoalescer(WINDOW),
+        [
+            (todo_id, {"title": "updated title"}),
+            (other_id, {"title": None}),
+        ],
+    )
+
+    assert results[0]["title"] == "updated title"
+    assert isinstance(results[1], Exception)
+    assert not isinstance(results[1], TodoNotFound)
+    assert stored_title(todo_id) == "updated title"
+    assert stored_title(other_id) == "second todo"
+
+
+def test_post_commit_failure_still_resolves_every_caller(monkeypatch):
+    todo_id = insert_todo()
+    other_id = insert_todo(title="second todo")
+
+    def broken_track(db_todo):
+        raise RuntimeError("scheduler down")
+
+    monkeypatch.setattr(coalescing_module.deadline_scheduler, "track", broken_track)
+
+    results = submit_all(
+        TodoUpdateCoalescer(WINDOW),
+        [
+            (todo_id, {"title": "updated title"}),
+            (other_id, {"title": "other title"}),
+            (999_999, {"title": "missing todo"}),
+        ],
+    )
+
+    assert results[0]["title"] == "updated title"
+    assert results[1]["title"] == "other title"
+    assert isinstance(results[2], TodoNotFound)
+
+
+def test_unexpected_error_is_fanned_out(monkeypatch):
+    todo_id = insert_todo()
+    coalescer = TodoUpdateCoalescer(WINDOW)
+
+    def crashing_run(user_id, items):
+        raise SystemError("worker crashed")
+
+    monkeypatch.setattr(coalescer, "_run", crashing_run)
+
+    results = submit_all(
+        coalescer,
+        [(todo_id, {"title": "updated title"}), (todo_id, {"priority": 2})],
+    )
+
+    # a leader a saját hibáját kapja, a többi hívó nem akad el
+    assert isinstance(results[0], SystemError)
+    assert isinstance(results[1], RuntimeError)
+    assert coalescer._tails == {}
@@ -0,0 +1,8 @@
+from datetime import datetime, timezone
+
+
+def as_utc(value: datetime):
+    # SQL Server DATETIME tz nélkül adja vissza az értéket; ezeket UTC-nek tekintjük
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
@@ -0,0 +1,373 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+from threading import Lock
+from typing import Callable, Optional
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select, update
+from database.connection import engine
+from database.sharding import fan_out, routing_engines
+from database.models import Todo, SchedulerLease
+from utils.dates import as_utc
+import asyncio
+import heapq
+import logging
+import os
+import socket
+import uuid
+
+logger = logging.getLogger(__name__)
+
+scheduler_enabled = os.getenv("DEADLINE_SCHEDULER_ENABLED", "true").lower() == "true"
+reminder_lead_minutes = int(os.getenv("DEADLINE_REMINDER_LEAD_MINUTES", "15"))
+horizon_hours = int(os.getenv("DEADLINE_HORIZON_HOURS", "24"))
+resync_minutes = int(os.getenv("DEADLINE_RESYNC_MINUTES", "5"))
+lease_seconds = int(os.getenv("DEADLINE_LEASE_SECONDS", "60"))
+
+LEASE_NAME = "deadline_scheduler"
+
+
+@dataclass
+class DeadlineEvent:
+    todo_id: int
+    user_id: int
+    deadline: datetime
+    fired_at: datetime
+
+
+def log_sink(event: DeadlineEvent):
+    logger.info(
+        "Deadline approaching: todo=%s user=%s deadline=%s",
+        event.todo_id,
+        event.user_id,
+        event.deadline.isoformat(),
+    )
+
+
+def webhook_sink(event: DeadlineEvent):
+    # Stub: a tényleges HTTP hívás helyett csak naplózzuk a payloadot
+    logger.info(
+        "Webhook %s <- %s",
+        os.getenv("DEADLINE_WEBHOOK_URL", "<not configured>"),
+        {
+            "todo_id": event.todo_id,
+            "user_id": event.user_id,
+            "deadline": event.deadline.isoformat(),
+        },
+    )
+
+
+SINKS = {
+    "log": log_sink,
+    "webhook": webhook_sink,
+}
+
+
+class DeadlineScheduler:
+    """
+    Min-heap a közelgő határidőkről (deadline - lead időpont szerint).
+
+    A create/update/delete végpontok track()/untrack() hívásokkal tartják
+    naprakészen (O(log n)); a heapből lustán töröljük az elavult bejegyzéseket.
+    Időnként egy indexelt tartomány-lekérdezés (deadline a horizonton belül)
+    újraépíti a heapet, így más workerek írásai is bekerülnek. A resync alatt
+    érkező változásokat külön gyűjtjük, és a csere után újra alkalmazzuk.
+
+    Több worker esetén csak a lease-t birtokló folyamat tart heapet és küld
+    eseményt (scheduler_leases tábla a primary-n); a többi worker írásait a
+    következő resync veszi fel, ezért a resync intervallum legyen rövidebb a
+    lead időnél.
+
+    A todo azonosítók csak shardon belül egyediek, ezért a kulcs (user_id, todo_id).
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[DeadlineEvent], None],
+        lead: timedelta,
+        horizon: timedelta,
+        resync_interval: timedelta,
+        lease_ttl: timedelta = timedelta(seconds=lease_seconds),
+    ):
+        self.sink = sink
+        self.lead = lead
+        self.horizon = horizon
+        self.resync_interval = resync_interval
+        self.lease_ttl = lease_ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.leader = False
+
+        self._heap: list[tuple[datetime, int, int]] = []
+        self._entries: dict[tuple[int, int], datetime] = {}
+        self._fired: dict[tuple[int, int], datetime] = {}
+        self._resyncing = False
+        self._dirty: dict[tuple[int, int], Optional[datetime]] = {}
+        self._lock = Lock()
+
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def track(self, todo: Todo):
+        if not self.leader:
+            return
+        if todo.status == "done" or todo.archived:
+            self.untrack(todo.user_id, todo.id)
+            return
+
+        key = (todo.user_id, todo.id)
+        deadline = as_utc(todo.deadline)
+        now = datetime.now(timezone.utc)
+        if deadline < now:
+            # a resync-hez hasonlóan a lejárt határidőkre nem küldünk emlékeztetőt
+            self.untrack(todo.user_id, todo.id)
+            return
+        in_horizon = deadline <= now + self.horizon
+
+        with self._lock:
+            if self._resyncing:
+                self._dirty[key] = deadline if in_horizon else None
+
+            if not in_horizon:
+                # a horizonton túli határidőket a következő resync veszi fel
+                self._entries.pop(key, None)
+                return
+            if self._entries.get(key) == deadline:
+                return
+
+            self._set_entry(key, deadline)
+            is_next = self._heap[0][1:] == key
+
+        if is_next:
+            self._notify()
+
+    def untrack(self, user_id: int, todo_id: int):
+        if not self.leader:
+            return
+        key = (user_id, todo_id)
+        with self._lock:
+            if self._resyncing:
+                self._dirty[key] = None
+            self._entries.pop(key, None)
+            self._fired.pop(key, None)
+
+    def _set_entry(self, key: tuple[int, int], deadline: datetime):
+        self._entries[key] = deadline
+        heapq.heappush(self._heap, (deadline - self.lead, *key))
+
+    def resync(self):
+        with self._lock:
+            self._resyncing = True
+            self._dirty = {}
+
+        try:
+            now = datetime.now(timezone.utc)
+            statement = select(Todo.user_id, Todo.id, Todo.deadline).where(
+                Todo.deadline >= now,
+                Todo.deadline < now + self.horizon,
+                Todo.status != "done",
+                Todo.archived == False,
+            )
+            shard_rows = fan_out(
+                lambda session: session.exec(statement).all(), routing_engines.values()
+            )
+
+            entries = {
+                (user_id, todo_id): as_utc(deadline)
+                for rows in shard_rows
+                for user_id, todo_id, deadline in rows
+            }
+            heap = [
+                (deadline - self.lead, user_id, todo_id)
+                for (user_id, todo_id), deadline in entries.items()
+            ]
+            heapq.heapify(heap)
+
+            with self._lock:
+                self._entries = entries
+                self._heap = heap
+                self._fired = {
+                    key: deadline
+                    for key, deadline in self._fired.items()
+                    if key in entries
+                }
+
+                # a lekérdezés óta történt track/untrack hívások felülírják a snapshotot
+                for key, deadline in self._dirty.items():
+                    if deadline is None:
+                        self._entries.pop(key, None)
+                        self._fired.pop(key, None)
+                    elif self._entries.get(key) != deadline:
+                        self._set_entry(key, deadline)
+        finally:
+            with self._lock:
+                self._resyncing = False
+                self._dirty = {}
+
+        self._notify()
+
+    def pop_due(self, now: datetime):
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, user_id, todo_id = heapq.heappop(self._heap)
+                key = (user_id, todo_id)
+                deadline = self._entries.get(key)
+
+                # elavult bejegyzés (törölt vagy módosított határidő)
+                if deadline is None or deadline - self.lead != fire_at:
+                    continue
+                if self._fired.get(key) == deadline:
+                    continue
+
+                self._fired[key] = deadline
+                due.append(DeadlineEvent(todo_id, user_id, deadline, now))
+
+            next_fire_at = self._heap[0][0] if self._heap else None
+        return due, next_fire_at
+
+    def try_acquire_lease(self):
+        """
+        Megújítja vagy átveszi a lease-t, ha a miénk vagy lejárt. True, ha ez a
+        folyamat a futtató.
+        """
+        now = datetime.now(timezone.utc)
+        expires_at = now + self.lease_ttl
+
+        with Session(engine) as session:
+            result = session.exec(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == LEASE_NAME,
+                    or_(
+                        SchedulerLease.owner == self.owner,
+                        SchedulerLease.expires_at < now,
+                    ),
+                )
+                .values(owner=self.owner, expires_at=expires_at)
+            )
+            if result.rowcount:
+                session.commit()
+                return True
+
+            if session.get(SchedulerLease, LEASE_NAME) is not None:
+                return False
+
+            session.add(
+                SchedulerLease(name=LEASE_NAME, owner=self.owner, expires_at=expires_at)
+            )
+            try:
+                session.commit()
+            except IntegrityError:
+                # egy másik worker közben létrehozta
+                session.rollback()
+                return False
+            return True
+
+    def release_lease(self):
+        with Session(engine) as session:
+            session.exec(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == LEASE_NAME,
+                    SchedulerLease.owner == self.owner,
+                )
+                .values(expires_at=datetime.now(timezone.utc))
+            )
+            session.commit()
+
+    def _set_leader(self, leader: bool):
+        if leader == self.leader:
+            return
+        self.leader = leader
+        if not leader:
+            with self._lock:
+                self._heap = []
+                self._entries = {}
+                self._fired = {}
+
+    def _notify(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        now = datetime.now(timezone.utc)
+        next_lease_check = now
+        next_resync = now
+
+        while True:
+            now = datetime.now(timezone.utc)
+            if now >= next_lease_check:
+                was_leader = self.leader
+                try:
+                    self._set_leader(await asyncio.to_thread(self.try_acquire_lease))
+                except Exception:
+                    logger.exception("Deadline scheduler lease check failed")
+                    self._set_leader(False)
+                if self.leader and not was_leader:
+                    next_resync = now
+                next_lease_check = now + self.lease_ttl / 3
+
+            if self.leader and now >= next_resync:
+                try:
+                    await asyncio.to_thread(self.resync)
+                except Exception:
+                    logger.exception("Deadline resync failed")
+                next_resync = now + self.resync_interval
+
+            self._wakeup.clear()
+            next_fire_at = None
+            if self.leader:
+                due, next_fire_at = self.pop_due(datetime.now(timezone.utc))
+                for event in due:
+                    try:
+                        self.sink(event)
+                    except Exception:
+                        logger.exception(
+                            "Deadline sink failed for todo %s", event.todo_id
+                        )
+
+            wake_at = next_lease_check
+            if self.leader and next_resync < wake_at:
+                wake_at = next_resync
+            if next_fire_at is not None and next_fire_at < wake_at:
+                wake_at = next_fire_at
+            timeout = max((wake_at - datetime.now(timezone.utc)).total_seconds(), 0)
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if not scheduler_enabled:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._loop = None
+
+        if self.leader:
+            try:
+                await asyncio.to_thread(self.release_lease)
+            except Exception:
+                logger.exception("Deadline scheduler lease release failed")
+            self._set_leader(False)
+
+
+deadline_scheduler = DeadlineScheduler(
+    sink=SINKS[os.getenv("DEADLINE_SINK", "log")],
+    lead=timedelta(minutes=reminder_lead_minutes),
+    horizon=timedelta(hours=horizon_hours),
+    resync_interval=timedelta(minutes=resync_minutes),
+)
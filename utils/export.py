@@ -0,0 +1,203 @@
+from sqlmodel import Session
+from database.models import Todo, Category, Status
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.ipc as pa_ipc
+import pyarrow.parquet as pq
+
+EXPORT_BATCH_SIZE = 10_000
+
+# Az oszlopokat közvetlenül a cursorból olvassuk, ORM objektumok nélkül
+EXPORT_COLUMNS = [
+    Todo.id,
+    Todo.title,
+    Todo.description,
+    Todo.category,
+    Todo.status,
+    Todo.priority,
+    Todo.deadline,
+    Todo.created_at,
+    Todo.modified_at,
+    Todo.completed_at,
+    Todo.archived,
+]
+
+MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "csv": "text/csv",
+}
+
+FILE_EXTENSIONS = {
+    "parquet": "parquet",
+    "arrow": "arrows",
+    "csv": "csv",
+}
+
+CATEGORY_VALUES = [c.value for c in Category]
+STATUS_VALUES = [s.value for s in Status]
+CATEGORY_INDEX = {value: i for i, value in enumerate(CATEGORY_VALUES)}
+STATUS_INDEX = {value: i for i, value in enumerate(STATUS_VALUES)}
+
+TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+
+def build_schema(with_section: bool, dictionary: bool):
+    label_type = pa.dictionary(pa.int8(), pa.string()) if dictionary else pa.string()
+
+    fields = [
+        pa.field("id", pa.int64()),
+        pa.field("title", pa.string()),
+        pa.field("description", pa.string()),
+        pa.field("category", label_type),
+        pa.field("status", label_type),
+        pa.field("priority", pa.int8()),
+        pa.field("deadline", TIMESTAMP),
+        pa.field("created_at", TIMESTAMP),
+        pa.field("modified_at", TIMESTAMP),
+        pa.field("completed_at", TIMESTAMP),
+        pa.field("archived", pa.bool_()),
+    ]
+    if with_section:
+        fields.insert(0, pa.field("section", label_type))
+    return pa.schema(fields)
+
+
+def label_array(values, labels: list[str], index: dict[str, int], dictionary: bool):
+    # Enum tagot és nyers stringet is elfogadunk, attól függően, mit ad vissza a driver
+    keys = [getattr(v, "value", v) for v in values]
+    if not dictionary:
+        return pa.array(keys, pa.string())
+    indices = pa.array([index[k] for k in keys], pa.int8())
+    return pa.DictionaryArray.from_arrays(indices, pa.array(labels, pa.string()))
+
+
+def rows_to_batch(rows, schema: pa.Schema, section: str | None, sections: list[str]):
+    dictionary = pa.types.is_dictionary(schema.field("category").type)
+    (
+        ids,
+        titles,
+        descriptions,
+        categories,
+        statuses,
+        priorities,
+        deadlines,
+        created,
+        modified,
+        completed,
+        archived,
+    ) = zip(*rows)
+
+    arrays = [
+        pa.array(ids, pa.int64()),
+        pa.array(titles, pa.string()),
+        pa.array(descriptions, pa.string()),
+        label_array(categories, CATEGORY_VALUES, CATEGORY_INDEX, dictionary),
+        label_array(statuses, STATUS_VALUES, STATUS_INDEX, dictionary),
+        pa.array(priorities, pa.int8()),
+        pa.array(deadlines, TIMESTAMP),
+        pa.array(created, TIMESTAMP),
+        pa.array(modified, TIMESTAMP),
+        pa.array(completed, TIMESTAMP),
+        pa.array(archived, pa.bool_()),
+    ]
+    if section is not None:
+        section_index = {name: i for i, name in enumerate(sections)}
+        arrays.insert(
+            0,
+            label_array([section] * len(ids), sections, section_index, dictionary),
+        )
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def iter_record_batches(session, statements, schema: pa.Schema):
+    """
+    statements: (section, select) párok; a section None, ha nincs szakasz oszlop.
+    """
+    sections = [section for section, _ in statements if section is not None]
+
+    for section, statement in statements:
+        result = session.exec(
+            statement.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for rows in result.partitions():
+            yield rows_to_batch(rows, schema, section, sections)
+
+
+class ChunkSink:
+    """
+    Írható fájl-szerű cél, amely az írt byte-okat gyűjti, amíg ki nem ürítjük.
+    A pozíciót külön számoljuk, mert a parquet footer offseteket a tell()-ből veszi.
+    """
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_export(bind, statements, format: str, schema: pa.Schema):
+    # Saját session: a StreamingResponse a végpont visszatérése után iterál,
+    # amikorra a függőségként kapott session már lezárulhat
+    sink = ChunkSink()
+    output = pa.PythonFile(sink, mode="w")
+
+    if format == "parquet":
+        writer = pq.ParquetWriter(output, schema)
+    elif format == "arrow":
+        writer = pa_ipc.new_stream(output, schema)
+    else:
+        writer = pa_csv.CSVWriter(output, schema)
+
+    with Session(bind) as session:
+        for batch in iter_record_batches(session, statements, schema):
+            writer.write_batch(batch)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+
+    writer.close()
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
+
+
+def export_todos(bind, statements, format: str):
+    """
+    Batch-enként olvassa a sorokat a cursorból, és darabonként adja vissza a
+    parquet / Arrow IPC / CSV kimenetet. Visszatér: (generátor, media_type, kiterjesztés).
+    """
+    with_section = statements[0][0] is not None
+    schema = build_schema(with_section, dictionary=format != "csv")
+
+    return (
+        stream_export(bind, statements, format, schema),
+        MEDIA_TYPES[format],
+        FILE_EXTENSIONS[format],
+    )
@@ -0,0 +1,144 @@
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from threading import Event, Lock
+from sqlmodel import Session
+from database.models import Todo
+from database.sharding import engine_for_user
+from utils.deadline_scheduler import deadline_scheduler
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# 0 = kikapcsolva; pl. 5 esetén egy felhasználó 5 ms-on belüli PATCH-ei egy commitba kerülnek
+write_coalescing_ms = float(os.getenv("WRITE_COALESCING_MS", "0"))
+
+
+def apply_todo_update(db_todo: Todo, update_data: dict, now: datetime):
+    new_status = update_data.get("status")
+    if new_status is not None:
+        if new_status == "done":
+            db_todo.completed_at = now
+        else:
+            db_todo.completed_at = None
+
+    for field_name, value in update_data.items():
+        setattr(db_todo, field_name, value)
+
+    db_todo.modified_at = now
+
+
+@dataclass
+class PendingUpdate:
+    todo_id: int
+    update_data: dict
+    requested_at: datetime
+    future: Future = field(default_factory=Future)
+
+
+class TodoNotFound(LookupError):
+    pass
+
+
+class TodoUpdateCoalescer:
+    """
+    Egy felhasználó rövid időablakon belül érkező todo módosításait egyetlen
+    tranzakcióban commitolja.
+
+    Az ablakot nyitó kérés (leader) vár, majd érkezési sorrendben alkalmazza a
+    módosításokat, így mezőnként az utolsó írás nyer. Ugyanannak a
+    felhasználónak a batch-ei láncban, sorban commitolnak. Minden hívó a saját
+    módosítása utáni állapotot kapja vissza, illetve a saját hibáját. Ha a
+    közös commit elbukik, a módosításokat egyenként újrafuttatjuk.
+    """
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._pending: dict[int, list[PendingUpdate]] = {}
+        # felhasználónként az utolsó, még be nem fejezett batch
+        self._tails: dict[int, Event] = {}
+        self._lock = Lock()
+
+    @property
+    def enabled(self):
+        return self.window_seconds > 0
+
+    def submit(self, user_id: int, todo_id: int, update_data: dict):
+        item = PendingUpdate(todo_id, update_data, datetime.now(timezone.utc))
+
+        with self._lock:
+            batch = self._pending.get(user_id)
+            is_leader = batch is None
+            if is_leader:
+                batch = self._pending[user_id] = []
+            batch.append(item)
+
+        if is_leader:
+            time.sleep(self.window_seconds)
+            with self._lock:
+                batch = self._pending.pop(user_id)
+                previous = self._tails.get(user_id)
+                done = self._tails[user_id] = Event()
+
+            try:
+                if previous is not None:
+                    previous.wait()
+                self._run(user_id, batch)
+            finally:
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(
+                            RuntimeError("Coalesced update was not completed")
+                        )
+                done.set()
+                with self._lock:
+                    if self._tails.get(user_id) is done:
+                        del self._tails[user_id]
+
+        return item.future.result()
+
+    def _apply(self, session: Session, user_id: int, item: PendingUpdate, touched):
+        db_todo = session.get(Todo, item.todo_id)
+        if not db_todo or db_todo.user_id != user_id:
+            return TodoNotFound(item.todo_id)
+
+        apply_todo_update(db_todo, item.update_data, item.requested_at)
+        session.add(db_todo)
+        touched[db_todo.id] = db_todo
+
+        # a hívó a saját módosítása utáni állapotot kapja
+        return db_todo.model_dump()
+
+    def _run(self, user_id: int, items: list[PendingUpdate]):
+        touched: dict[int, Todo] = {}
+        try:
+            with Session(
+                engine_for_user(user_id, write=True), expire_on_commit=False
+            ) as session:
+                outcomes = [self._apply(session, user_id, item, touched) for item in items]
+                session.commit()
+        except Exception as exc:
+            if len(items) == 1:
+                items[0].future.set_exception(exc)
+                return
+            for item in items:
+                self._run(user_id, [item])
+            return
+
+        try:
+            for db_todo in touched.values():
+                deadline_scheduler.track(db_todo)
+        except Exception:
+            # a módosítás már commitolva van; a következő resync pótolja
+            logger.exception("Deadline tracking failed after coalesced update")
+        finally:
+            for item, outcome in zip(items, outcomes):
+                if isinstance(outcome, TodoNotFound):
+                    item.future.set_exception(outcome)
+                else:
+                    item.future.set_result(outcome)
+
+
+todo_update_coalescer = TodoUpdateCoalescer(window_seconds=write_coalescing_ms / 1000)